@@ -1,4 +1,5 @@
 from functools import cached_property
+import threading
 import requests
 from bs4 import BeautifulSoup
 from urllib.parse import urljoin, unquote, quote
@@ -34,7 +35,8 @@ class PageManager:
 
     def get_page(self, page_name: str):
         if page_name not in self.pages:
-            self.pages[page_name] = Page(page_name, self)
+            # setdefault keeps a single Page per name when several threads ask for a new page at once
+            self.pages.setdefault(page_name, Page(page_name, self))
         return self.pages[page_name]
 
     def name_to_url(self, name: str) -> str:
@@ -121,30 +123,42 @@ class Page:
     def __init__(self, name: str, page_manager: PageManager):
         self.name = name
         self.page_manager = page_manager
+        # Links are cached per page with their own locks, so threads sharing the page manager fetch different pages at once
+        # (cached_property locks before python 3.12 are shared by all pages, so only one page is fetched at a time)
+        self.outgoing_pages_lock = threading.Lock()
+        self.incoming_pages_lock = threading.Lock()
+        self.outgoing_pages_cache = None
+        self.incoming_pages_cache = None
 
     @staticmethod
     def get_path_string(path):
         return " -> ".join(path)
 
-    @cached_property
+    @property
     def outgoing_pages(self):
-        return self.page_manager.get_wikipedia_pages_from_url(self.url).difference([self])
+        with self.outgoing_pages_lock:
+            if self.outgoing_pages_cache is None:
+                self.outgoing_pages_cache = self.page_manager.get_wikipedia_pages_from_url(self.url).difference([self])
+        return self.outgoing_pages_cache
 
-    @cached_property
+    @property
     def incoming_pages(self):
-        name = self.name[::-1] if self.page_manager.is_hebrew else self.name
-        incoming_pages = self.page_manager.get_wikipedia_pages_from_url(f"{self.page_manager.url_page_header}Special:WhatLinksHere/{name}").difference([self])
-        not_incoming_pages = set()
-        # for page in incoming_pages:
-        #     if self not in page.outgoing_pages:
-        #         not_incoming_pages.add(page)
-        return incoming_pages.difference(not_incoming_pages)
+        with self.incoming_pages_lock:
+            if self.incoming_pages_cache is None:
+                name = self.name[::-1] if self.page_manager.is_hebrew else self.name
+                incoming_pages = self.page_manager.get_wikipedia_pages_from_url(f"{self.page_manager.url_page_header}Special:WhatLinksHere/{name}").difference([self])
+                not_incoming_pages = set()
+                # for page in incoming_pages:
+                #     if self not in page.outgoing_pages:
+                #         not_incoming_pages.add(page)
+                self.incoming_pages_cache = incoming_pages.difference(not_incoming_pages)
+        return self.incoming_pages_cache
 
     @cached_property
     def url(self) -> str:
         return self.page_manager.name_to_url(self.name)
 
-    @cached_property
+    @property
     def rank(self) -> str:
         return len(self.outgoing_pages)
 
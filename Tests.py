@@ -1,6 +1,10 @@
 import os
+import time
+import threading
+from concurrent.futures import ThreadPoolExecutor
 import pytest
-from WikiExplorer import search_path_on_wikipedia
+from WikiExplorer import search_path_on_wikipedia, search_path_in_portfolio, WikiExplorer, BFSWikiExplorer, SearchStrategy
+from NLPModels import NLPModel
 from Pages import PageManager
 
 CLI_COMMAND = "python WikiExplorer.py"
@@ -67,12 +71,194 @@ def run_cli(args):
     print(f"Running {CLI_COMMAND} {args}")
     assert 0 == os.system(f"{CLI_COMMAND} {args}")
 
+
+class ConstantNLPModel(NLPModel):
+    """
+    NLP model ranking all pages the same, so tests don't need a real model
+    """
+    def get_vector(self, text):
+        return text
+
+    def get_similarity_between_vectors(self, vector1, vector2):
+        return 0
+
+
+class RecordingExplorer(WikiExplorer):
+    """
+    Explorer recording every advance as (direction, expanded page, was the search stopped when it started)
+    """
+    DELAY = 0
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.advances = []
+
+    def get_outgoing_neighbors(self, node):
+        self.advances.append(("forward", node, self.stop_event.is_set()))
+        time.sleep(self.DELAY)
+        return super().get_outgoing_neighbors(node)
+
+    def get_incoming_neighbors(self, node):
+        self.advances.append(("backward", node, self.stop_event.is_set()))
+        time.sleep(self.DELAY)
+        return super().get_incoming_neighbors(node)
+
+
+class RecordingBFSExplorer(RecordingExplorer, BFSWikiExplorer):
+    pass
+
+
+class SlowExplorer(RecordingExplorer):
+    DELAY = 0.05
+
+
+class FailingExplorer(WikiExplorer):
+    def search_path(self):
+        raise RuntimeError("Failing explorer")
+
+
+@pytest.fixture
+def fake_wikipedia(monkeypatch):
+    """
+    Replace fetching links from Wikipedia with a fixed graph: {page name: names of pages it links to}
+    """
+    graph = {}
+
+    def get_links_from_html(page_manager, url):
+        if "Special:WhatLinksHere/" in url:
+            name = url.split("Special:WhatLinksHere/")[-1]
+            names = [page for page, links in graph.items() if name in links]
+        else:
+            names = graph.get(page_manager.url_to_name(url), [])
+        return {page_manager.name_to_url(name) for name in names}
+
+    monkeypatch.setattr(PageManager, "get_links_from_html", get_links_from_html)
+    return graph
+
+
+def get_chain_graph(length):
+    return {f"P{i}": [f"P{i + 1}"] for i in range(length)}
+
+
+def run_portfolio(start_page, end_page, strategies, no_nav_boxes=False):
+    page_managers = {False: PageManager(), True: PageManager(no_nav_boxes=True)}
+    return search_path_in_portfolio(start_page, end_page, ConstantNLPModel(), page_managers, float("inf"), strategies, no_nav_boxes)
+
 @pytest.mark.sanity
 @pytest.mark.parametrize("start_page, end_page", [("House", "Cow"), ("Hat", "Bat")])
 def test_search(start_page, end_page):
     run_search(start_page, end_page)
 
 
+@pytest.mark.sanity
+@pytest.mark.parametrize("start_page, end_page", [("House", "Cow"), ("Hat", "Bat")])
+def test_portfolio_search(start_page, end_page):
+    run_search(start_page, end_page, portfolio=True)
+
+
+@pytest.mark.sanity
+def test_portfolio_search_no_path():
+    run_search("4_AM_club", "Xpertdoc", should_be_no_path=True, portfolio=True)
+
+
+@pytest.mark.sanity
+@pytest.mark.parametrize("forward_steps", [1, 3])
+def test_forward_steps(fake_wikipedia, forward_steps):
+    fake_wikipedia.update(get_chain_graph(30))
+    wiki_exp = RecordingExplorer("P0", "P30", ConstantNLPModel(), PageManager(), float("inf"), forward_steps)
+    assert wiki_exp.search_path() == [f"P{i}" for i in range(31)]
+    directions = [direction for direction, _, _ in wiki_exp.advances]
+    assert directions[:2 * (forward_steps + 1)] == (["forward"] * forward_steps + ["backward"]) * 2
+
+
+@pytest.mark.sanity
+def test_bfs_explorer_expands_in_discovery_order(fake_wikipedia):
+    # Binary tree of depth 3 under R (children of R1 are R11 and R12), the end page is linked only from the last leaf
+    for name in ["R", "R1", "R2", "R11", "R12", "R21", "R22"]:
+        fake_wikipedia[name] = [name + "1", name + "2"]
+    fake_wikipedia["R222"] = ["Z"]
+    wiki_exp = RecordingBFSExplorer("R", "Z", ConstantNLPModel(), PageManager(), float("inf"), forward_steps=100)
+    assert wiki_exp.search_path() == ["R", "R2", "R22", "R222", "Z"]
+    expanded_pages = [page for _, page, _ in wiki_exp.advances]
+    assert expanded_pages[:7] == sorted(expanded_pages[:7], key=len)
+    assert set(expanded_pages[:7]) == {"R", "R1", "R2", "R11", "R12", "R21", "R22"}
+    assert expanded_pages[-1] == "R222"
+
+
+@pytest.mark.sanity
+def test_portfolio_first_path_wins_and_others_stop(fake_wikipedia):
+    fake_wikipedia.update(get_chain_graph(30))
+    explorers = []
+
+    def recorded(explorer_class):
+        def create_explorer(*args, **kwargs):
+            explorers.append(explorer_class(*args, **kwargs))
+            return explorers[-1]
+        return create_explorer
+
+    threads_before = threading.active_count()
+    strategies = [SearchStrategy("slow1", recorded(SlowExplorer)), SearchStrategy("fast", recorded(RecordingExplorer)),
+                  SearchStrategy("slow2", recorded(SlowExplorer), 3), SearchStrategy("slow3", recorded(SlowExplorer), 1, True)]
+    path, wiki_exp = run_portfolio("P0", "P30", strategies)
+    assert path == [f"P{i}" for i in range(31)]
+    assert wiki_exp.label == "[fast] "
+    # All explorer threads are done when the portfolio returns
+    assert threading.active_count() == threads_before
+    # Stopped explorers may only finish the advance they were in the middle of
+    for loser in explorers:
+        if loser is not wiki_exp:
+            assert len(loser.advances) < 30
+            assert sum(stopped for _, _, stopped in loser.advances) <= 1
+
+
+@pytest.mark.sanity
+def test_portfolio_survives_failing_strategy(fake_wikipedia):
+    fake_wikipedia.update(get_chain_graph(5))
+    path, wiki_exp = run_portfolio("P0", "P5", [SearchStrategy("failing", FailingExplorer), SearchStrategy("nlp")])
+    assert path == [f"P{i}" for i in range(6)]
+    assert wiki_exp.label == "[nlp] "
+    with pytest.raises(RuntimeError):
+        run_portfolio("P0", "P5", [SearchStrategy("failing1", FailingExplorer), SearchStrategy("failing2", FailingExplorer)])
+
+
+@pytest.mark.sanity
+def test_portfolio_no_path_returns_explorer_of_requested_links(fake_wikipedia):
+    fake_wikipedia.update(get_chain_graph(5))
+    fake_wikipedia["Q0"] = ["Q1"]
+    strategies = [SearchStrategy("nlp-no-nav", no_nav_boxes=True), SearchStrategy("nlp"), SearchStrategy("bfs", BFSWikiExplorer)]
+    path, wiki_exp = run_portfolio("P0", "Q1", strategies)
+    assert path is None
+    assert wiki_exp.label == "[nlp] "
+    assert not wiki_exp.page_manager.no_nav_boxes
+
+
+@pytest.mark.sanity
+def test_concurrent_link_fetches(monkeypatch):
+    lock = threading.Lock()
+    fetches = []
+    running_fetches = [0]
+    max_running_fetches = [0]
+
+    def get_links_from_html(page_manager, url):
+        with lock:
+            fetches.append(url)
+            running_fetches[0] += 1
+            max_running_fetches[0] = max(max_running_fetches[0], running_fetches[0])
+        time.sleep(0.1)
+        with lock:
+            running_fetches[0] -= 1
+        return set()
+
+    monkeypatch.setattr(PageManager, "get_links_from_html", get_links_from_html)
+    page_manager = PageManager()
+    pages = [page_manager.get_page(f"P{i}") for i in range(6)]
+    # Different pages are fetched at once, and each page is fetched once even when asked from several threads
+    with ThreadPoolExecutor(max_workers=12) as executor:
+        list(executor.map(lambda page: page.outgoing_pages, pages + pages))
+    assert max_running_fetches[0] == len(pages)
+    assert len(fetches) == len(pages)
+
+
 @pytest.mark.sanity
 def test_search_no_path():
     run_search("4_AM_club", "Xpertdoc", should_be_no_path=True)
@@ -186,6 +372,7 @@ def test_two_forbidden_pages():
                                   "-s Jerusalem -fp Whale -e Kangaroo",
                                   "-s Jerusalem -fp Mammal -fp Whale -e Kangaroo",
                                   "-s Jerusalem -fp Mammal -fp Whale -e Kangaroo -fp Ark_of_the_Covenant",
-                                  "-he -s חתול -e כלב", "-he -s חתול -e כלב -nn"])
+                                  "-he -s חתול -e כלב", "-he -s חתול -e כלב -nn",
+                                  "-s Cat -e Dog -p", "-s Cat -e Dog -nn -p"])
 def test_cli(args):
     run_cli(args)
@@ -1,7 +1,11 @@
 import math
+import itertools
+import threading
 import networkx as nx
 import heapq
 import argparse
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from dataclasses import dataclass
 
 from NLPModels import NLPModel, EnglishNLPModel, HebrewNLPModel
 from Pages import PageManager, Page
@@ -16,7 +20,8 @@ class WikiExplorer:
     """
     Wiki explorer for path finding between pages
     """
-    def __init__(self, start_page_name: str, end_page_name: str, nlp_model: NLPModel, page_manager: PageManager, max_path_length: float):
+    def __init__(self, start_page_name: str, end_page_name: str, nlp_model: NLPModel, page_manager: PageManager, max_path_length: float,
+                 forward_steps: int = 1, stop_event: threading.Event = None, label: str = ""):
         self.start_page = start_page_name
         self.end_page = end_page_name
         self.explored_graph = nx.DiGraph()
@@ -25,6 +30,10 @@ class WikiExplorer:
         self.page_manager = page_manager
         self.max_path_length = max_path_length
         self.max_path_length_one_side = float("inf") if self.max_path_length == float("inf") else math.ceil(self.max_path_length / 2)
+        # Number of forward advances done for each backward advance
+        self.forward_steps = forward_steps
+        self.stop_event = stop_event or threading.Event()
+        self.label = f"[{label}] " if label else ""
 
     def get_page_rank(self, page, dest_page):
         """
@@ -63,11 +72,23 @@ class WikiExplorer:
     def print_current_path(self, source, target):
         begin_path = nx.shortest_path(self.explored_graph, self.start_page, source)
         end_path = nx.shortest_path(self.explored_graph, target, self.end_page)
-        print(f"{self.search_number:3}) " +
+        print(self.label + f"{self.search_number:3}) " +
               GREEN_COLOR + Page.get_path_string(begin_path) + RESET_COLOR +
               "   ===>   " +
               RED_COLOR + Page.get_path_string(end_path) + RESET_COLOR)
 
+    def rank_pages(self, pages, dest_page):
+        """
+        Heap of `pages` ranked in relation to `dest_page`, or None if the search was stopped while ranking
+        """
+        pages_with_ranks = []
+        for page in pages:
+            if self.stop_event.is_set():
+                return None
+            pages_with_ranks.append([self.get_page_rank(page, dest_page), page, dest_page])
+        heapq.heapify(pages_with_ranks)
+        return pages_with_ranks
+
     def search_path(self):
         # Item in heap: [rank, node, dest_node that rank refers to]
         sources_heap = [[self.get_page_rank(self.start_page, self.end_page), self.start_page, self.end_page]]
@@ -79,19 +100,23 @@ class WikiExplorer:
         current_target = self.end_page
 
         while sources_heap and targets_heap:
-            if self.search_number % 2 == 0:
+            if self.stop_event.is_set():
+                return
+            if self.search_number % (self.forward_steps + 1) != self.forward_steps:
                 # Advance forward
                 current_target = targets_heap[0][1]
                 while not self.is_valid_target(current_target):
                     heapq.heappop(targets_heap)
                     seen_targets.discard(current_target)
                     if not targets_heap:
-                        print("No path exists")
+                        print(self.label + "No path exists")
                         return
                     current_target = targets_heap[0][1]
 
                 _, current_source, from_target = heapq.heappop(sources_heap)
                 while from_target != current_target or not self.is_valid_source(current_source):
+                    if self.stop_event.is_set():
+                        return
                     if self.is_valid_source(current_source):
                         heapq.heappush(sources_heap, [self.get_page_rank(current_source, current_target), current_source, current_target])
                     else:
@@ -99,14 +124,15 @@ class WikiExplorer:
                     if sources_heap:
                         _, current_source, from_target = heapq.heappop(sources_heap)
                     else:
-                        print("No path exists")
+                        print(self.label + "No path exists")
                         return
 
                 neighbors = self.get_outgoing_neighbors(current_source)
                 new_neighbors = neighbors.difference(seen_sources)
                 seen_sources.update(new_neighbors)
-                new_neighbors_with_ranks = [[self.get_page_rank(neighbor, current_target), neighbor, current_target] for neighbor in new_neighbors]
-                heapq.heapify(new_neighbors_with_ranks)
+                new_neighbors_with_ranks = self.rank_pages(new_neighbors, current_target)
+                if new_neighbors_with_ranks is None:
+                    return
                 sources_heap = list(heapq.merge(sources_heap, new_neighbors_with_ranks))
                 self.explored_graph.add_edges_from([(current_source, neighbor) for neighbor in neighbors])
 
@@ -117,12 +143,14 @@ class WikiExplorer:
                     heapq.heappop(sources_heap)
                     seen_sources.discard(current_source)
                     if not sources_heap:
-                        print("No path exists")
+                        print(self.label + "No path exists")
                         return
                     current_source = sources_heap[0][1]
 
                 _, current_target, from_source = heapq.heappop(targets_heap)
                 while from_source != current_source or not self.is_valid_target(current_target):
+                    if self.stop_event.is_set():
+                        return
                     if self.is_valid_target(current_target):
                         heapq.heappush(targets_heap, [self.get_page_rank(current_target, current_source), current_target, current_source])
                     else:
@@ -130,18 +158,21 @@ class WikiExplorer:
                     if targets_heap:
                         _, current_target, from_source = heapq.heappop(targets_heap)
                     else:
-                        print("No path exists")
+                        print(self.label + "No path exists")
                         return
 
                 neighbors = self.get_incoming_neighbors(current_target)
                 new_neighbors = neighbors.difference(seen_targets)
                 seen_targets.update(new_neighbors)
-                new_neighbors_with_ranks = [[self.get_page_rank(neighbor, current_source), neighbor, current_source] for neighbor in new_neighbors]
-                heapq.heapify(new_neighbors_with_ranks)
+                new_neighbors_with_ranks = self.rank_pages(new_neighbors, current_source)
+                if new_neighbors_with_ranks is None:
+                    return
                 targets_heap = list(heapq.merge(targets_heap, new_neighbors_with_ranks))
                 self.explored_graph.add_edges_from([(neighbor, current_target) for neighbor in neighbors])
 
             # Check current path
+            if self.stop_event.is_set():
+                return
             self.print_current_path(current_source, current_target)
             self.search_number += 1
             while nx.has_path(self.explored_graph, self.start_page, self.end_page):
@@ -150,6 +181,8 @@ class WikiExplorer:
                 # Validate path, remove edges that aren't real
                 is_valid_path = True
                 for i in range(len(path)-1):
+                    if self.stop_event.is_set():
+                        return
                     if self.page_manager.get_page(path[i+1]) not in self.page_manager.get_page(path[i]).outgoing_pages:
                         self.explored_graph.remove_edge(path[i], path[i+1])
                         self.page_manager.get_page(path[i+1]).incoming_pages.discard(path[i])
@@ -157,16 +190,96 @@ class WikiExplorer:
 
                 if is_valid_path:
                     if len(path) <= self.max_path_length:
-                        print("Found path" + f" (len={len(path)}): " + Page.get_path_string(path))
+                        print(self.label + "Found path" + f" (len={len(path)}): " + Page.get_path_string(path))
                         return path
                     else:
                         # Path too long - continue searching
                         break
 
-        print("No path exists")
+        print(self.label + "No path exists")
 
 
-def search_path_on_wikipedia(start_page_name, end_page_name, is_hebrew=False, max_path_length=float("inf"), no_nav_boxes=False, forbidden_pages: list=None):
+class BFSWikiExplorer(WikiExplorer):
+    """
+    Wiki explorer that ignores page similarity and expands pages in the order they were discovered
+    """
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.discovery_counter = itertools.count()
+
+    def get_page_rank(self, page, dest_page):
+        return next(self.discovery_counter)
+
+
+@dataclass
+class SearchStrategy:
+    """
+    Configuration of a single explorer raced in portfolio mode
+    """
+    name: str
+    explorer_class: type = WikiExplorer
+    forward_steps: int = 1
+    no_nav_boxes: bool = False
+
+
+def get_portfolio_strategies(no_nav_boxes=False):
+    """
+    Strategies raced in portfolio mode
+    Strategies without nav boxes are only added if nav boxes are allowed, since a path found without them is valid either way
+    """
+    strategies = [SearchStrategy("nlp", WikiExplorer, 1, no_nav_boxes),
+                  SearchStrategy("nlp-forward", WikiExplorer, 3, no_nav_boxes),
+                  SearchStrategy("bfs", BFSWikiExplorer, 1, no_nav_boxes),
+                  SearchStrategy("bfs-forward", BFSWikiExplorer, 3, no_nav_boxes)]
+    if not no_nav_boxes:
+        strategies += [SearchStrategy("nlp-no-nav", WikiExplorer, 1, True),
+                       SearchStrategy("bfs-no-nav", BFSWikiExplorer, 1, True)]
+    return strategies
+
+
+def search_path_in_portfolio(start_page_name, end_page_name, nlp_model, page_managers, max_path_length, strategies, no_nav_boxes=False):
+    """
+    Race all strategies in threads, return the first verified path and stop the other explorers
+    Explorers with the same nav boxes setting share a page manager (links cache), and all share the nlp model (embeddings cache)
+    A strategy that raises just loses the race, the error is re-raised only if all strategies raised
+    If no path is found, the returned explorer is the first one searching the link set of `no_nav_boxes`,
+    since explorers without nav boxes failing says nothing about paths through nav boxes
+    """
+    stop_event = threading.Event()
+    explorers = [strategy.explorer_class(start_page_name, end_page_name, nlp_model, page_managers[strategy.no_nav_boxes],
+                                         max_path_length, strategy.forward_steps, stop_event, strategy.name)
+                 for strategy in strategies]
+
+    def run_explorer(wiki_exp):
+        path = wiki_exp.search_path()
+        if path:
+            wiki_exp.page_manager.validate_path(path, start_page_name, end_page_name)
+        return path
+
+    errors = []
+    with ThreadPoolExecutor(max_workers=len(explorers)) as executor:
+        futures = {executor.submit(run_explorer, wiki_exp): wiki_exp for wiki_exp in explorers}
+        try:
+            for future in as_completed(futures):
+                try:
+                    path = future.result()
+                except Exception as e:
+                    print(futures[future].label + f"Failed: {e!r}")
+                    errors.append(e)
+                    continue
+                if path:
+                    return path, futures[future]
+        finally:
+            # Leaving the executor waits for the other explorers, which stop at their next check of the event
+            stop_event.set()
+
+    if len(errors) == len(explorers):
+        raise errors[0]
+    return None, next((wiki_exp for wiki_exp in explorers if wiki_exp.page_manager is page_managers[no_nav_boxes]), explorers[0])
+
+
+def search_path_on_wikipedia(start_page_name, end_page_name, is_hebrew=False, max_path_length=float("inf"), no_nav_boxes=False, forbidden_pages: list=None,
+                             portfolio=False):
     page_manager = PageManager(is_hebrew, forbidden_pages, no_nav_boxes)
 
     if is_hebrew:
@@ -179,6 +292,13 @@ def search_path_on_wikipedia(start_page_name, end_page_name, is_hebrew=False, ma
         end_page_name = page_manager.get_random_page_name()
 
     nlp_model = HebrewNLPModel() if is_hebrew else EnglishNLPModel()
+    if portfolio:
+        page_managers = {no_nav_boxes: page_manager}
+        if not no_nav_boxes:
+            page_managers[True] = PageManager(is_hebrew, list(forbidden_pages or []), True)
+        return search_path_in_portfolio(start_page_name, end_page_name, nlp_model, page_managers, max_path_length,
+                                        get_portfolio_strategies(no_nav_boxes), no_nav_boxes)
+
     wiki_exp = WikiExplorer(start_page_name, end_page_name, nlp_model, page_manager, max_path_length)
     path = wiki_exp.search_path()
     if path:
@@ -194,9 +314,11 @@ def main():
     parser.add_argument("--hebrew", '-he', help="In hebrew Wikipedia", action="store_true")
     parser.add_argument("--max-length", '-ml', type=int, help="Maximum allowed length of path (including start and end page)", default=float("inf"))
     parser.add_argument("--forbidden-page", '-fp', action='append', help="Forbidden pages to pass through", default=[])
+    parser.add_argument("--portfolio", '-p', help="Race several search strategies in parallel and take the first path found", action="store_true")
 
     args = parser.parse_args()
-    search_path_on_wikipedia(args.start_page, args.end_page, args.hebrew, args.max_length, args.no_nav_boxes, args.forbidden_page)
+    search_path_on_wikipedia(args.start_page, args.end_page, args.hebrew, args.max_length, args.no_nav_boxes, args.forbidden_page,
+                             args.portfolio)
 
 
 if __name__ == "__main__":